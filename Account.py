@@ -5,7 +5,7 @@ from Currency import Currency
 from Transaction import Transaction
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class Account:
     """Represents an account."""
 
@@ -26,11 +26,9 @@ class Account:
         )
 
     def already_exists(self, accounts: dict["Account"]) -> bool:
-        """Returns True if the account already exists, False otherwise."""
-        return any(
-            (self.name == existing_account.name)
-            for existing_account in accounts.values()
-        )
+        """Returns True if the account already exists, False otherwise.
+        Accounts are keyed by name."""
+        return self.name in accounts
 
     def is_valid(self) -> bool:
         """Returns True if the account is valid, False otherwise."""
@@ -57,9 +55,23 @@ class Account:
         """
         Adds transactions to account. Returns the number of duplicate transactions.
         """
-        num_duplicate_transactions = sum(
-            bool(self.add_transaction(transaction, overwrite_if_exists))
-            for transaction in transactions
+        new_transactions = {}
+        for transaction in transactions:
+            # As when adding them one by one, the first transaction with an id is
+            # kept, unless later ones overwrite it.
+            if overwrite_if_exists:
+                new_transactions[transaction.transaction_id] = transaction
+            else:
+                new_transactions.setdefault(transaction.transaction_id, transaction)
+        if not overwrite_if_exists:
+            for transaction_id in new_transactions.keys() & self.transactions.keys():
+                del new_transactions[transaction_id]
+        num_transactions_before = len(self.transactions)
+        self.transactions.update(new_transactions)
+        # Duplicates are transactions that didn't add a new id, whether they
+        # clashed with an existing transaction or with one in the same batch.
+        num_duplicate_transactions = len(transactions) - (
+            len(self.transactions) - num_transactions_before
         )
         self.logger.info(
             "Added %s transactions, found %s duplicates.%s.",
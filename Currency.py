@@ -1,7 +1,9 @@
 import enum
 import functools
+from typing import TYPE_CHECKING
 
-from forex_python.converter import CurrencyRates
+if TYPE_CHECKING:
+    from forex_python.converter import CurrencyRates
 
 
 class Currency(enum.StrEnum):
@@ -15,14 +17,23 @@ class Currency(enum.StrEnum):
 class CurrencyConverter:
     """A currency converter."""
 
-    c = CurrencyRates()
+    @staticmethod
+    @functools.cache
+    def _currency_rates() -> "CurrencyRates":
+        """Returns the rates client.
+
+        forex_python (and requests with it) is slow to import, and is only needed
+        once rates are converted, so it is imported on first use."""
+        from forex_python.converter import CurrencyRates
+
+        return CurrencyRates()
 
     # Cache the rates to avoid unnecessary API calls.
     @classmethod
     @functools.cache
     def get_rate(cls, from_currency: Currency, to_currency: Currency) -> float:
         """Returns the rate from the given currency to the given currency."""
-        return cls.c.get_rate(from_currency, to_currency)
+        return cls._currency_rates().get_rate(from_currency, to_currency)
 
     @classmethod
     def convert(
@@ -1,8 +1,11 @@
 """ExpenseTracker class. See class docstring for more information."""
 import attr
 import logging
-import json
+from collections.abc import Iterator
 
+import ahocorasick
+import numpy as np
+import orjson
 import pandas as pd
 
 from analytics_utils import (
@@ -14,10 +17,81 @@ from analytics_utils import (
 )
 from Account import Account
 from Currency import Currency, CurrencyConverter
-from Rule import Rule
+from Rule import Rule, RuleRelation
 from Transaction import Transaction
 
 
+# Below this many rules, checking every rule against every transaction is faster
+# than building and querying the rule index.
+MIN_RULES_TO_INDEX = 3
+
+
+def _index_rules(
+    rules: list[Rule],
+) -> tuple[dict[str, ahocorasick.Automaton], dict[str, dict], list[int]]:
+    """Indexes rules by field, to find the rules that may apply to a transaction.
+
+    A rule only applies if all of its conditions do, so each rule is indexed by its
+    first `contains`, `is` or `one of` condition on a text field. Returns:
+    - an Aho-Corasick automaton per field, mapping `contains` values to rule indices;
+    - a dictionary per field, mapping `is` and `one of` values to rule indices;
+    - the indices of the rules that can't be indexed, which may always apply."""
+    automatons = {}
+    values_to_rules = {}
+    unindexed = []
+    for index, rule in enumerate(rules):
+        for condition in rule.conditions:
+            if Transaction.data_model().get(condition.field) is not str:
+                continue
+            if condition.relation == RuleRelation.CONTAINS:
+                # An empty value is contained in every text.
+                if not all(condition.values):
+                    continue
+                automaton = automatons.setdefault(
+                    condition.field, ahocorasick.Automaton()
+                )
+                for value in condition.values:
+                    if automaton.exists(value):
+                        automaton.get(value).add(index)
+                    else:
+                        automaton.add_word(value, {index})
+                break
+            if condition.relation in (RuleRelation.EQUALS, RuleRelation.ONE_OF):
+                field_values_to_rules = values_to_rules.setdefault(condition.field, {})
+                for value in condition.values:
+                    field_values_to_rules.setdefault(value, set()).add(index)
+                break
+        else:
+            unindexed.append(index)
+    for automaton in automatons.values():
+        automaton.make_automaton()
+    return automatons, values_to_rules, unindexed
+
+
+def _candidate_rules(
+    transaction: Transaction,
+    automatons: dict[str, ahocorasick.Automaton],
+    values_to_rules: dict[str, dict],
+    unindexed: list[int],
+) -> set[int]:
+    """Returns the indices of the rules, indexed by `_index_rules`,
+    that may apply to the transaction. Each field is lowercased once."""
+    candidates = set(unindexed)
+    for field, automaton in automatons.items():
+        value = getattr(transaction, field)
+        # Only text contains anything, e.g. not a missing (NaN) payee.
+        if isinstance(value, str):
+            for _, rule_indices in automaton.iter(value.lower()):
+                candidates.update(rule_indices)
+    for field, field_values_to_rules in values_to_rules.items():
+        candidates.update(field_values_to_rules.get(getattr(transaction, field), ()))
+    return candidates
+
+
+# Keys of the dictionary representation of an ExpenseTracker.
+DICT_KEYS = ("accounts", "rules", "transactions", "config")
+
+
 @attr.s(auto_attribs=True)
 class ExpenseTrackerConfig:
     default_currency: Currency
@@ -35,6 +109,11 @@ class ExpenseTracker:
     rules: list[Rule] = attr.Factory(list)
     logger: logging.Logger = logging.getLogger(__name__)
     config: ExpenseTrackerConfig = ExpenseTrackerConfig(Currency.CHF)
+    # The same rules as `rules`, for constant-time membership checks.
+    _rule_set: set[Rule] = attr.ib(init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._rule_set = set(self.rules)
 
     @property
     def balance(self) -> float:
@@ -88,15 +167,17 @@ class ExpenseTracker:
     def add_rule(self, rule: Rule) -> None:
         """Adds a rule to the ExpenseTracker.
         Raises ValueError if the rule already exists."""
-        if rule in self.rules:
+        if rule in self._rule_set:
             raise ValueError("Rule already exists")
         self.rules.append(rule)
+        self._rule_set.add(rule)
         self.logger.debug(f"Added rule {rule}")
 
     def delete_rule(self, rule: Rule) -> None:
         """Deletes a rule from the ExpenseTracker.
         Raises ValueError if the rule does not exist."""
         self.rules.remove(rule)
+        self._rule_set.remove(rule)
         self.logger.debug(f"Deleted rule {rule}")
 
     def get_transactions_in_accounts(
@@ -183,12 +264,44 @@ class ExpenseTracker:
 
         if field not in Transaction.data_model():
             raise ValueError(f"Field {field} does not exist")
-        return list({getattr(transaction, field) for transaction in self.transactions})
+        # dict.fromkeys keeps the values in order of first appearance, unlike a set,
+        # so the options are listed in the same order on every rerun.
+        return list(
+            dict.fromkeys(
+                getattr(transaction, field) for transaction in self.transactions
+            )
+        )
 
     def categorize_transactions(self) -> None:
-        """Categorizes all transactions in the ExpenseTracker by applying existing rules."""
+        """Categorizes all transactions in the ExpenseTracker by applying existing rules.
+
+        With many rules, each transaction is only checked against the rules that may
+        apply to it, found with one lookup per field (see `_index_rules`).
+        """
+        if len(self.rules) < MIN_RULES_TO_INDEX:
+            for transaction in self.transactions:
+                transaction.categorize(self.rules)
+            return
+        rules_index = _index_rules(self.rules)
+        for transaction in self.transactions:
+            candidates = _candidate_rules(transaction, *rules_index)
+            # Keep the rules' order, which sets their precedence.
+            transaction.categorize([self.rules[index] for index in sorted(candidates)])
+
+    def apply_rule(self, rule: Rule) -> None:
+        """Categorizes the transactions that the given (new) rule applies to.
+
+        The rule can't change the category of the other transactions, so only the
+        matching ones are categorized again, instead of all of them."""
         for transaction in self.transactions:
-            transaction.categorize(self.rules)
+            if transaction.rule_applies(rule):
+                transaction.categorize(self.rules)
+
+    def unapply_rule(self, rule: Rule) -> None:
+        """Categorizes the transactions that the given (deleted) rule applied to.
+
+        Like `apply_rule`, only the matching transactions are categorized again."""
+        self.apply_rule(rule)
 
     def extend(self, other: "ExpenseTracker") -> None:
         """Extends the ExpenseTracker with the given ExpenseTracker.
@@ -212,22 +325,68 @@ class ExpenseTracker:
                 f"Account {transaction.account} does not exist: {e}"
             ) from e
 
-    def as_dict(self) -> dict:
-        """Returns a dictionary representation of the ExpenseTracker."""
-        return {
-            "accounts": [account.as_dict() for account in self.accounts.values()],
-            "rules": [rule.as_dict() for rule in self.rules],
-            "transactions": [
+    def as_dict(self, keys: tuple[str, ...] = DICT_KEYS) -> dict:
+        """Returns a dictionary representation of the ExpenseTracker.
+
+        Only the given keys are serialized, e.g. `("accounts",)` to update
+        an existing representation after adding an account."""
+        serializers = {
+            "accounts": lambda: [
+                account.as_dict() for account in self.accounts.values()
+            ],
+            "rules": lambda: [rule.as_dict() for rule in self.rules],
+            "transactions": lambda: [
                 transaction.as_dict()
                 for account in self.accounts.values()
                 for transaction in account.transactions.values()
             ],
-            "config": attr.asdict(self.config),
+            "config": lambda: attr.asdict(self.config),
         }
+        return {key: serializers[key]() for key in keys}
+
+    def as_dataframe(self) -> pd.DataFrame:
+        """Returns a DataFrame with all transactions in the ExpenseTracker.
+
+        The DataFrame has one column per Transaction field, filled in a single pass
+        over the transactions, rather than from one dictionary per transaction.
+        The date column is parsed to datetime, debit and credit are floats."""
+        transactions = self.transactions
+        columns = {
+            field: np.empty(
+                len(transactions), dtype=np.float64 if field_type is float else object
+            )
+            for field, field_type in Transaction.data_model().items()
+        }
+        field_columns = tuple(columns.items())
+        for i, transaction in enumerate(transactions):
+            for field, column in field_columns:
+                column[i] = getattr(transaction, field)
+        columns["date"] = pd.to_datetime(columns["date"])
+        return pd.DataFrame(columns, copy=False)
+
+    def iter_json(self) -> Iterator[bytes]:
+        """Yields the JSON representation of the ExpenseTracker, in chunks.
+
+        Transactions are serialized one at a time, so that their dictionary
+        representations are never all in memory at once (unlike `as_dict`)."""
+        yield b'{"accounts":'
+        yield orjson.dumps([account.as_dict() for account in self.accounts.values()])
+        yield b',"rules":'
+        yield orjson.dumps([rule.as_dict() for rule in self.rules])
+        yield b',"transactions":['
+        separator = b""
+        for account in self.accounts.values():
+            for transaction in account.transactions.values():
+                yield separator
+                yield orjson.dumps(transaction.as_dict())
+                separator = b","
+        yield b'],"config":'
+        yield orjson.dumps(attr.asdict(self.config))
+        yield b"}"
 
     def as_json(self) -> str:
         """Returns a JSON representation of the ExpenseTracker."""
-        return json.dumps(self.as_dict(), indent=4)
+        return b"".join(self.iter_json()).decode()
 
     @classmethod
     def from_dict(cls, expense_tracker_dict: dict) -> "ExpenseTracker":
@@ -1,6 +1,10 @@
 import attr
 import enum
+import functools
 import logging
+import operator
+import re
+from collections.abc import Callable
 
 
 class RuleOperator(enum.StrEnum):
@@ -31,7 +35,16 @@ class RuleAction(enum.StrEnum):
     TRANSFER_FROM = "transfer from"
 
 
-@attr.s(auto_attribs=True, frozen=True)
+def _contains_any(pattern: re.Pattern, target: str) -> bool:
+    """Returns True if the target contains a match of the pattern.
+    Only text contains anything, e.g. not a missing (NaN) payee."""
+    if not isinstance(target, str):
+        return False
+    # String matching is case-insensitive.
+    return pattern.search(target.lower()) is not None
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
 class RuleCondition:
     """A condition of a rule.
     A condition is a comparison between a field and a value.
@@ -41,24 +54,53 @@ class RuleCondition:
 
     field: str
     relation: RuleRelation
-    values: list
+    # Tuples rather than lists, so that conditions (and rules) are hashable.
+    values: tuple = attr.ib(converter=tuple)
+    _matcher: Callable = attr.ib(init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        # The class is frozen, so the matcher has to be set through object.
+        object.__setattr__(self, "_matcher", self._build_matcher())
+
+    def _build_matcher(self) -> Callable:
+        """Returns a function that checks the condition against a field value.
+
+        The function is chosen once per condition, from its relation and values."""
+        if self.relation == RuleRelation.CONTAINS:
+            # Matches any of the values. An empty list of values never matches.
+            pattern = "|".join(map(re.escape, self.values)) if self.values else "(?!)"
+            return functools.partial(_contains_any, re.compile(pattern))
+        if self.relation == RuleRelation.EQUALS:
+            assert len(self.values) == 1
+            return functools.partial(operator.eq, self.values[0])
+        if self.relation == RuleRelation.ONE_OF:
+            return frozenset(self.values).__contains__
+        raise ValueError(f"Unknown relation {self.relation}")
+
+    def matches(self, value) -> bool:
+        """Returns True if the condition applies to the given field value."""
+        return self._matcher(value)
 
     def __str__(self) -> str:
         """Returns a string representation of a RuleCondition."""
-        return f"{self.field} {self.relation.value} [{', '.join(self.values)}]"
+        return (
+            f"{self.field} {self.relation.value} [{', '.join(map(str, self.values))}]"
+        )
 
 
-@attr.s(auto_attribs=True, frozen=True)
+@attr.s(auto_attribs=True, frozen=True, slots=True)
 class Rule:
     """A rule that can be applied to transactions.
     A rule consists of multiple conditions that are combined with an operator.
     If the rule applies, the action is taken."""
 
-    conditions: list[RuleCondition]
+    conditions: tuple[RuleCondition, ...] = attr.ib(converter=tuple)
     action: RuleAction
     category: str
     operator: RuleOperator = RuleOperator.ALL
     logger: logging.Logger = logging.getLogger(__name__)
+    # Built by as_dict() on first use; rules are immutable so it never goes stale.
+    _dict: dict = attr.ib(init=False, default=None, eq=False, repr=False)
 
     def __str__(self) -> str:
         """Returns a string representation of a Rule."""
@@ -70,20 +112,27 @@ class Rule:
         )
 
     def as_dict(self) -> dict:
-        """Returns a dictionary representation of a Rule."""
-        return {
-            "conditions": [
+        """Returns a dictionary representation of a Rule.
+        The dictionary is cached on the rule, so it must not be modified."""
+        if self._dict is None:
+            object.__setattr__(
+                self,
+                "_dict",
                 {
-                    "field": condition.field,
-                    "relation": condition.relation,
-                    "values": condition.values,
-                }
-                for condition in self.conditions
-            ],
-            "action": self.action,
-            "category": self.category,
-            "operator": self.operator.value,
-        }
+                    "conditions": [
+                        {
+                            "field": condition.field,
+                            "relation": condition.relation,
+                            "values": list(condition.values),
+                        }
+                        for condition in self.conditions
+                    ],
+                    "action": self.action,
+                    "category": self.category,
+                    "operator": self.operator.value,
+                },
+            )
+        return self._dict
 
     @classmethod
     def from_dict(cls, rule_dict: dict) -> "Rule":
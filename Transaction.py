@@ -1,10 +1,11 @@
 import attr
+import functools
 
 from Currency import Currency
-from Rule import RuleRelation, Rule, RuleCondition
+from Rule import Rule, RuleCondition
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class Transaction:
     """
     Represents a transaction.
@@ -25,8 +26,11 @@ class Transaction:
     transfer_from: str = ""
 
     @staticmethod
+    @functools.cache
     def data_model():
-        """Returns the data model for a transaction."""
+        """Returns the data model for a transaction.
+
+        The dictionary is built once and shared: don't modify it."""
         return {
             "transaction_id": str,
             "date": str,
@@ -43,24 +47,9 @@ class Transaction:
 
     def _condition_applies(self, condition: RuleCondition) -> bool:
         """Returns True if the condition applies to the transaction, False otherwise."""
-        field = condition.field
-        relation = condition.relation
-        values = condition.values
-
-        if relation == RuleRelation.CONTAINS:
-            target = getattr(self, field)
-            # String matching is case-insensitive.
-            if isinstance(target, str):
-                target = target.lower()
-            return any(value in target for value in values)
-        if relation == RuleRelation.EQUALS:
-            assert len(values) == 1
-            return getattr(self, field) == values[0]
-        if relation == RuleRelation.ONE_OF:
-            return getattr(self, field) in values
-        raise ValueError(f"Unknown relation {relation}")
+        return condition.matches(getattr(self, condition.field))
 
-    def _rule_applies(self, rule: Rule) -> bool:
+    def rule_applies(self, rule: Rule) -> bool:
         """Returns True if the rule applies to the transaction, False otherwise."""
         return all(self._condition_applies(condition) for condition in rule.conditions)
 
@@ -71,7 +60,7 @@ class Transaction:
         """Categorizes the transaction by applying the given rules."""
         matched = False
         for rule in rules:
-            if self._rule_applies(rule):
+            if self.rule_applies(rule):
                 self.category = rule.category
                 if rule.action == "transfer to":
                     self.transfer_to = rule.category
@@ -1,5 +1,7 @@
 """Utility functions for analytics."""
+import datetime
 import enum
+import numpy as np
 import pandas as pd
 
 from Transaction import Transaction
@@ -102,6 +104,30 @@ def filter_df_transactions_by_dates(
     return df[(df["date"] >= start_date) & (df["date"] <= end_date)]
 
 
+def filter_df_transactions_by_dates_and_accounts(
+    df: pd.DataFrame,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    accounts: list[str],
+) -> pd.DataFrame:
+    """Returns a DataFrame with transactions within the given date range
+    and from the given accounts.
+
+    Both conditions are combined into a single mask on the raw arrays,
+    so the DataFrame is only filtered (and copied) once.
+    The account column must be categorical: accounts are compared by code."""
+    dates = df["date"].to_numpy()
+    account_codes = df["account"].cat.categories.get_indexer(accounts)
+    # Unknown accounts get code -1, which is also the code of missing values.
+    account_codes = account_codes[account_codes >= 0]
+    mask = (
+        (dates >= pd.to_datetime(start_date).to_datetime64())
+        & (dates <= pd.to_datetime(end_date).to_datetime64())
+        & np.isin(df["account"].cat.codes.to_numpy(), account_codes)
+    )
+    return df[mask]
+
+
 def filter_list_transactions_by_type(
     transactions: list[Transaction], transaction_type: TransactionType
 ) -> list[Transaction]:
@@ -1,9 +1,13 @@
+import contextlib
+import datetime
+import json
 import logging
+import os
 import traceback
 import uuid
-import time
-import json
 
+import numpy as np
+import orjson
 import pandas as pd
 import streamlit as st
 
@@ -18,16 +22,234 @@ from analytics_utils import (
     GROUPING_PERIOD_TO_ALTAIR_TIMEUNIT,
     FINANCIAL_METRIC_TO_TRANSACTION_FIELD,
     filter_df_transactions_by_dates,
+    filter_df_transactions_by_dates_and_accounts,
 )
 
 from Account import Account
-from Currency import Currency
-from ExpenseTracker import ExpenseTracker
+from Currency import Currency, CurrencyConverter
+from ExpenseTracker import DICT_KEYS, ExpenseTracker
 from Transaction import Transaction
 from Rule import Rule, RuleRelation, RuleAction, RuleCondition
 
 BASE_LOGGER = logging.getLogger(__name__)
 
+# Above this many rules, the rules tab uses a DataFrame instead of a static table.
+RULES_TABLE_MAX_ROWS = 100
+
+# The transactions table shows this many transactions per page.
+TRANSACTIONS_TABLE_PAGE_SIZE = 500
+
+# Fragments rerun only the decorated function when one of its widgets changes,
+# instead of the whole app. Before Streamlit 1.37 they were experimental,
+# and older Streamlit versions render tabs as plain functions.
+fragment = getattr(
+    st, "fragment", getattr(st, "experimental_fragment", lambda func: func)
+)
+
+# Reruns the whole app. st.rerun replaced st.experimental_rerun in Streamlit 1.27.
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+# Widget options, materialized once instead of on every rerun.
+_CURRENCIES = tuple(Currency)
+_CURRENCY_INDEX = {currency: index for index, currency in enumerate(_CURRENCIES)}
+_GROUP_BYS = tuple(GroupBy)
+_GROUPING_PERIODS = tuple(GroupingPeriod)
+_CHART_TYPES = tuple(ChartType)
+_FINANCIAL_METRICS = tuple(FinancialMetric)
+_RULE_RELATIONS = tuple(RuleRelation)
+_RULE_ACTIONS = tuple(RuleAction)
+_TRANSACTION_FIELDS = tuple(Transaction.data_model())
+_RULE_RELATION_INDEX = {
+    relation: index for index, relation in enumerate(_RULE_RELATIONS)
+}
+_RULE_ACTION_INDEX = {action: index for index, action in enumerate(_RULE_ACTIONS)}
+_TRANSACTION_FIELD_INDEX = {
+    field: index for index, field in enumerate(_TRANSACTION_FIELDS)
+}
+# Columns of the transactions table. Hides transaction_id, transfer_to, transfer_from.
+_TRANSACTIONS_TABLE_COLUMNS = [
+    "date",
+    "account",
+    "payee",
+    "description",
+    "debit",
+    "credit",
+    "currency",
+    "category",
+]
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_config(config_path: str, mtime_ns: int) -> dict:
+    """Returns the app config, shared by all sessions.
+
+    The config is only loaded again when its modification time (`mtime_ns`)
+    changes. It is read-only: don't modify the returned dictionary."""
+    with open(config_path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+# The data loaders below are cached on `data_version` (see
+# `ExpenseTrackerApp.data_version`), a token renewed every time the data is saved
+# to session state. The data itself is passed as underscored arguments, which
+# Streamlit doesn't hash.
+_cache_by_data_version = st.cache_data(max_entries=64, show_spinner=False)
+
+
+@_cache_by_data_version
+def _load_transactions_dataframe(
+    data_version: str, _expense_tracker: ExpenseTracker
+) -> pd.DataFrame:
+    """Returns a DataFrame with all transactions and their balance (credit - debit)."""
+    df = _expense_tracker.as_dataframe()
+    # Subtract the raw arrays: both columns share the same index,
+    # so there is no need for pandas to align them.
+    df["balance"] = df["credit"].to_numpy() - df["debit"].to_numpy()
+    # There are only a few accounts, currencies and categories:
+    # store them as integer codes instead of one string object per row.
+    return df.astype(
+        {"account": "category", "currency": "category", "category": "category"},
+        copy=False,
+    )
+
+
+@_cache_by_data_version
+def _load_account_balances(
+    data_version: str, _expense_tracker: ExpenseTracker
+) -> dict[str, float]:
+    """Returns the balance of each account in its own currency, keyed by name."""
+    df = _load_transactions_dataframe(data_version, _expense_tracker)
+    # Sum the transactions per account code, in one pass.
+    accounts = df["account"].cat.categories
+    net = dict(
+        zip(
+            accounts,
+            np.bincount(
+                df["account"].cat.codes.to_numpy(),
+                weights=df["balance"].to_numpy(),
+                minlength=len(accounts),
+            ),
+        )
+    )
+    return {
+        name: account.starting_balance + net.get(name, 0.0)
+        for name, account in _expense_tracker.accounts.items()
+    }
+
+
+@_cache_by_data_version
+def _load_chart_dataframe(
+    data_version: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    accounts: tuple[str, ...],
+    transaction_field: str,
+    group_by: str,
+    timeunit: str,
+    cumulative: bool,
+    chart_type: str,
+    _expense_tracker: ExpenseTracker,
+) -> pd.DataFrame:
+    """Returns the selected transactions, aggregated and downsampled for plotting."""
+    df = _load_transactions_dataframe(data_version, _expense_tracker)
+    # By default everything is selected, and there is nothing to filter.
+    if (
+        start_date != df["date"].min().date()
+        or end_date != df["date"].max().date()
+        or len(accounts) != len(_expense_tracker.accounts)
+    ):
+        df = filter_df_transactions_by_dates_and_accounts(
+            df, start_date, end_date, accounts
+        )
+    chart_df = plotting.aggregate_chart_data(
+        df,
+        transaction_field=transaction_field,
+        group_by=group_by,
+        timeunit=timeunit,
+        cumulative=cumulative,
+    )
+    if chart_type == "line":
+        chart_df = plotting.downsample_m4(chart_df, transaction_field, group_by)
+    return chart_df
+
+
+@_cache_by_data_version
+def _load_transactions_table(
+    data_version: str, _expense_tracker: ExpenseTracker
+) -> pd.DataFrame:
+    """Returns the transactions table, most recent transaction first."""
+    df = _load_transactions_dataframe(data_version, _expense_tracker)
+    # Hidden columns are dropped, not hidden, so they aren't sent to the browser.
+    return df[_TRANSACTIONS_TABLE_COLUMNS].sort_values(
+        "date", ascending=False, kind="stable"
+    )
+
+
+@_cache_by_data_version
+def _load_expense_tracker_json(
+    data_version: str, _expense_tracker: ExpenseTracker
+) -> str:
+    """Returns the JSON representation of the ExpenseTracker, for downloading."""
+    return _expense_tracker.as_json()
+
+
+@_cache_by_data_version
+def _load_entries_for_transaction_field(
+    data_version: str, field: str, _expense_tracker: ExpenseTracker
+) -> list:
+    """Returns all distinct values of the given field in the transactions."""
+    return _expense_tracker.get_entries_for_transaction_field(field)
+
+
+@_cache_by_data_version
+def _load_rules_table_rows(data_version: str, _rules: list[Rule]) -> list[dict]:
+    """Returns the rows of the static rules table, one per rule."""
+    return [
+        {
+            "Conditions": ", ".join(str(condition) for condition in rule.conditions),
+            "Action": rule.action.value,
+            "Category": rule.category,
+        }
+        for rule in _rules
+    ]
+
+
+@_cache_by_data_version
+def _load_rules_dataframe(data_version: str, _rules: list[Rule]) -> pd.DataFrame:
+    """Returns a DataFrame with one row per rule, and its condition decomposed."""
+    # Add rules to DF but decompose condition (there is only 1 in each list).
+    # Build one list per column, rather than one dictionary per rule.
+    conditions = [rule.conditions[0] for rule in _rules]
+    return pd.DataFrame(
+        {
+            "field": [condition.field for condition in conditions],
+            "relation": [condition.relation for condition in conditions],
+            "values": [list(condition.values) for condition in conditions],
+            "action": [rule.action for rule in _rules],
+            "category": [rule.category for rule in _rules],
+        },
+        copy=False,
+    )
+
+
+def _amounts_from_csv(column: pd.Series) -> pd.Series:
+    """Returns the amounts in a CSV column as floats. Empty cells are 0.
+    Raises ValueError with the lines of the amounts that can't be read."""
+    empty = column.isna()
+    if column.dtype == object:
+        # Empty cells of text columns are read as empty strings.
+        empty |= column.str.strip().eq("")
+    amounts = pd.to_numeric(column, errors="coerce")
+    invalid = amounts.isna() & ~empty
+    if invalid.any():
+        # Lines of the file, counting the header as line 1.
+        lines = (invalid.to_numpy().nonzero()[0] + 2).tolist()
+        raise ValueError(
+            f"Can't read the amounts in column '{column.name}' on lines "
+            f"{', '.join(map(str, lines[:10]))}{', ...' if len(lines) > 10 else ''}"
+        )
+    return amounts.fillna(0.0)
+
 
 def remove_streamlit_footer():
     """Sets footer style to hidden to hide Streamlit footer."""
@@ -48,9 +270,12 @@ class ExpenseTrackerApp:
     def __init__(self, config_path: str):
         self.logger = logging.getLogger(__name__)
         self.logger.info("============ Initializing ExpenseTrackerApp ============")
+        self._saves_deferred = False
+        self._unsaved_keys = set()
         try:
-            with open(config_path, "r") as f:
-                self.app_config = json.load(f)
+            self.app_config = _load_config(
+                config_path, os.stat(config_path).st_mtime_ns
+            )
         except FileNotFoundError as e:
             raise FileNotFoundError(f"Error while loading config: {e}") from e
 
@@ -77,21 +302,65 @@ class ExpenseTrackerApp:
         remove_streamlit_footer()
         self.logger.info("Removed Streamlit footer")
 
-        try:
-            self.expense_tracker = ExpenseTracker.from_dict(
+        self.expense_tracker = self._load_expense_tracker()
+
+    @property
+    def data_version(self) -> str:
+        """Returns a token identifying the data saved in session state.
+
+        A new token is generated on every save, so caches keyed on it are
+        invalidated by any change, and never shared between sessions."""
+        if "expense_tracker_version" not in st.session_state:
+            st.session_state["expense_tracker_version"] = uuid.uuid4().hex
+        return st.session_state["expense_tracker_version"]
+
+    def _load_expense_tracker(self) -> ExpenseTracker:
+        """Returns the ExpenseTracker saved in session state, or a new one.
+
+        The object is kept in session state, and only rebuilt from its saved
+        dictionary when the data version changes. Changes that are not saved
+        must be dropped with `discard_unsaved_changes`, or they carry over."""
+        if "expense_tracker" not in st.session_state:
+            self.logger.info(
+                "No ExpenseTracker found in session state. Creating new one."
+            )
+            return ExpenseTracker()
+        version, expense_tracker = st.session_state.get(
+            "expense_tracker_object", (None, None)
+        )
+        if version != self.data_version:
+            expense_tracker = ExpenseTracker.from_dict(
                 st.session_state["expense_tracker"]
             )
+            st.session_state["expense_tracker_object"] = (
+                self.data_version,
+                expense_tracker,
+            )
             self.logger.info("Loaded ExpenseTracker from session state.")
-        except KeyError as e:
-            self.logger.info(
-                f"No ExpenseTracker found in session state: {e}. Creating new one."
+            expense_tracker.log_state()
+        return expense_tracker
+
+    def discard_unsaved_changes(self):
+        """Reloads the ExpenseTracker from its saved dictionary in session state.
+
+        Use when a change fails halfway, and won't be saved."""
+        st.session_state.pop("expense_tracker_object", None)
+        self.expense_tracker = self._load_expense_tracker()
+
+    def save_expense_tracker_to_session_state(self, keys: tuple[str, ...] = DICT_KEYS):
+        """Saves the given keys of the ExpenseTracker's dictionary representation
+        to session state. The other keys are left as they are."""
+        if "expense_tracker" in st.session_state:
+            st.session_state["expense_tracker"].update(
+                self.expense_tracker.as_dict(keys)
             )
-            self.expense_tracker = ExpenseTracker()
-
-        self.expense_tracker.log_state()
-
-    def save_expense_tracker_to_session_state(self):
-        st.session_state["expense_tracker"] = self.expense_tracker.as_dict()
+        else:
+            st.session_state["expense_tracker"] = self.expense_tracker.as_dict()
+        version = uuid.uuid4().hex
+        st.session_state["expense_tracker_version"] = version
+        # The saved object matches the saved dictionary: the next run reuses it
+        # instead of rebuilding it.
+        st.session_state["expense_tracker_object"] = (version, self.expense_tracker)
 
     def run(self):
         """Runs the app. Creates all streamlit components."""
@@ -127,6 +396,7 @@ class ExpenseTrackerApp:
         with rules_tab:
             self.display_rules_tab()
 
+    @fragment
     def display_start_tab(self):
         st.header("Welcome to 💸 **centzz!**")
         with st.expander("Quickstart"):
@@ -203,7 +473,9 @@ class ExpenseTrackerApp:
             )
             if st.download_button(
                 "Download data 📎",
-                data=self.expense_tracker.as_json(),
+                data=_load_expense_tracker_json(
+                    self.data_version, self.expense_tracker
+                ),
                 file_name="centzz_data.json",
                 mime="application/json",
             ):
@@ -221,25 +493,46 @@ class ExpenseTrackerApp:
         )
 
     def _load_app_data_from_json(self, data_file) -> None:
-        """Loads app data from uploaded file to ExpenseTracker."""
+        """Loads app data from uploaded file to ExpenseTracker.
+        Shows an error if the file can't be loaded."""
+        data = data_file.read()
         try:
-            result = json.loads(data_file.read().decode("utf-8"))
-        except FileNotFoundError as e:
-            raise FileNotFoundError(f"Error while loading JSON data: {e}") from e
+            result = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Files exported by earlier versions may contain NaN, which only json reads.
+            try:
+                result = json.loads(data)
+            except json.JSONDecodeError as e:
+                st.error(f"Error while loading JSON data: {e}")
+                return
         try:
             self.expense_tracker.extend(ExpenseTracker.from_dict(result))
-        except KeyError as e:
-            raise KeyError(f"Error while updating ExpenseTracker data: {e}") from e
+        except (KeyError, TypeError, ValueError) as e:
+            # `extend` may have added part of the data already.
+            self.discard_unsaved_changes()
+            st.error(f"Error while updating ExpenseTracker data: {e}")
+            return
+        # Rules are otherwise only applied when added or edited: apply all rules,
+        # existing and loaded, to all transactions, existing and loaded.
+        self.expense_tracker.categorize_transactions()
         self.logger.info("Loaded ExpenseTracker from JSON file.")
         self.expense_tracker.log_state()
-        self.save()
-        st.success("Data loaded successfully! Go to the other tabs and have fun.")
+        st.toast("Data loaded successfully! Go to the other tabs and have fun.")
+        # The start tab may run as a fragment, so rerun the whole app
+        # to show the loaded data in the other tabs.
+        self.save_and_reload()
 
+    @fragment
     def display_overview_tab(self):
-        st.metric(
-            "Total balance",
-            f"{self.expense_tracker.balance:.2f} {self.expense_tracker.config.default_currency}",
+        default_currency = self.expense_tracker.config.default_currency
+        balances = _load_account_balances(self.data_version, self.expense_tracker)
+        total_balance = sum(
+            CurrencyConverter.convert(
+                balances[name], account.currency, default_currency
+            )
+            for name, account in self.expense_tracker.accounts.items()
         )
+        st.metric("Total balance", f"{total_balance:.2f} {default_currency}")
 
         st.header("Accounts")
         self.display_accounts()
@@ -256,7 +549,8 @@ class ExpenseTrackerApp:
             # end_date: current date
             today = pd.Timestamp.today()
             start_date = pd.Timestamp(today.year, today.month, 1)
-            df = filter_df_transactions_by_dates(df, start_date, today)
+            if df["date"].min() < start_date or df["date"].max() > today:
+                df = filter_df_transactions_by_dates(df, start_date, today)
             if not df.empty:
                 st.dataframe(df)
             else:
@@ -265,6 +559,7 @@ class ExpenseTrackerApp:
         else:
             st.write("No data yet...")
 
+    @fragment
     def display_accounts_tab(self):
         st.header("🏦 Accounts")
         st.subheader("Overview")
@@ -272,6 +567,7 @@ class ExpenseTrackerApp:
         self.display_add_new_account()
         self.display_delete_account()
 
+    @fragment
     def display_analytics_tab(self):
         st.header("📈 Analytics")
         if not self.expense_tracker.accounts:
@@ -294,22 +590,17 @@ class ExpenseTrackerApp:
         with plot_type_col:
             plot_type = st.selectbox(
                 "Plot type",
-                list(ChartType),
+                _CHART_TYPES,
             )
         col0, col1, col2 = st.columns(3)
         with col0:
-            transaction_field = st.selectbox("Show", list(FinancialMetric))
+            transaction_field = st.selectbox("Show", _FINANCIAL_METRICS)
         with col1:
-            grouping_period = st.selectbox("grouped by", list(GroupingPeriod))
+            grouping_period = st.selectbox("grouped by", _GROUPING_PERIODS)
         with col2:
-            group_by = st.selectbox("and", list(GroupBy))
+            group_by = st.selectbox("and", _GROUP_BYS)
 
-        df = pd.DataFrame(transaction.as_dict() for transaction in transactions)
-        # Make date column a datetime object
-        df["date"] = pd.to_datetime(df["date"])
-        # Fill all numerical nans with 0
-        df["credit"] = pd.to_numeric(df["credit"], errors="coerce").fillna(0)
-        df["debit"] = pd.to_numeric(df["debit"], errors="coerce").fillna(0)
+        df = _load_transactions_dataframe(self.data_version, self.expense_tracker)
 
         # Get the min and max dates possible for the date range selector
         min_date = df["date"].min().date()
@@ -326,13 +617,6 @@ class ExpenseTrackerApp:
         if start_date > end_date:
             st.error("End date must fall after start date.")
             return
-        # Rename column "debit" to "expense" and credit to "income"
-        # df = df.rename(columns={"debit": "expense", "credit": "income"})
-        df["balance"] = df["credit"] - df["debit"]
-        # Filter to keep only transactions between start and end date
-        df = filter_df_transactions_by_dates(df, start_date, end_date)
-        # Filter to keep only transactions from selected accounts
-        df = df[df["account"].isin(selected_accounts)]
 
         transaction_field = FINANCIAL_METRIC_TO_TRANSACTION_FIELD[transaction_field]
         cumulative = False
@@ -340,16 +624,30 @@ class ExpenseTrackerApp:
             cumulative = True
             transaction_field = transaction_field.replace("cumulative_", "")
 
-        chart = plotting.get_chart_data(
-            df,
+        timeunit = GROUPING_PERIOD_TO_ALTAIR_TIMEUNIT[grouping_period]
+        # Keep only transactions between start and end date, from selected accounts.
+        chart_df = _load_chart_dataframe(
+            self.data_version,
+            start_date,
+            end_date,
+            tuple(selected_accounts),
+            transaction_field,
+            group_by.lower(),
+            timeunit,
+            cumulative,
+            plot_type.value.lower(),
+            self.expense_tracker,
+        )
+        chart_spec = plotting.get_chart_data(
             transaction_field=transaction_field,
             group_by=group_by.lower(),
-            timeunit=GROUPING_PERIOD_TO_ALTAIR_TIMEUNIT[grouping_period],
+            timeunit=timeunit,
             cumulative=cumulative,
             chart_type=plot_type.value.lower(),
         )
-        st.altair_chart(chart, use_container_width=True)
+        st.vega_lite_chart(chart_df, chart_spec, use_container_width=True)
 
+    @fragment
     def display_transactions_tab(self):
         st.header("📖 Transactions")
 
@@ -367,10 +665,10 @@ class ExpenseTrackerApp:
             with col3:
                 currency = st.selectbox(
                     "Currency (auto selected)",
-                    list(Currency),
-                    index=list(Currency).index(
+                    _CURRENCIES,
+                    index=_CURRENCY_INDEX[
                         self.expense_tracker.accounts[account].currency
-                    ),
+                    ],
                     disabled=True,
                     key="single_currency_selectbox",
                 )
@@ -397,7 +695,7 @@ class ExpenseTrackerApp:
                     st.error(f"Error adding transaction: {e}")
                     return
                 st.success(f"Transaction added: {transaction}")
-                self.save_and_reload()
+                self.save_and_reload(("accounts", "transactions"))
         with st.expander("Add transactions from CSV"):
             if csv_file := st.file_uploader(
                 "Choose a CSV file",
@@ -407,15 +705,23 @@ class ExpenseTrackerApp:
                 # Parse headers of CSV file to map them to transaction columns
                 st.write("Choose the correct column for each transaction field:")
                 try:
-                    df = pd.read_csv(csv_file)
+                    # Only the header is needed to map the columns: the whole file
+                    # is parsed once the transactions are added.
+                    columns = list(pd.read_csv(csv_file, nrows=0).columns)
                 except FileNotFoundError as e:
                     raise FileNotFoundError(f"Error while loading CSV file: {e}") from e
-                transaction_id_header = st.selectbox("Transaction ID", df.columns)
-                date_header = st.selectbox("Date", df.columns)
-                payee_header = st.selectbox("Payee", df.columns)
-                description_header = st.multiselect("Description(s)", df.columns)
-                credit_header = st.selectbox("Credit", df.columns)
-                debit_header = st.selectbox("Debit", df.columns)
+                transaction_id_header = st.selectbox("Transaction ID", columns)
+                date_header = st.selectbox("Date", columns)
+                payee_header = st.selectbox("Payee", columns)
+                description_header = st.multiselect("Description(s)", columns)
+                credit_header = st.selectbox("Credit", columns)
+                debit_header = st.selectbox("Debit", columns)
+                date_format = st.text_input(
+                    "Date format (optional)",
+                    placeholder="%d.%m.%Y",
+                    help="Format of the dates in the file, e.g. %d.%m.%Y. "
+                    "If empty, it is inferred from the first date.",
+                )
 
                 headers = {
                     "transaction_id": transaction_id_header,
@@ -442,7 +748,8 @@ class ExpenseTrackerApp:
                 if overwrite:
                     st.warning(
                         "This will overwrite existing transactions with the same "
-                        "transaction ID. Any manual modifications to these transactions will be lost.",
+                        "transaction ID. Any manual modifications to these "
+                        "transactions will be lost.",
                         icon="⚠️",
                     )
 
@@ -456,51 +763,46 @@ class ExpenseTrackerApp:
 
                 add_transactions = st.button("Add transactions", type="primary")
                 if add_transactions and account_selection:
-                    try:
-                        new_transactions = [
-                            Transaction(
-                                transaction_id=row[headers["transaction_id"]],
-                                date=pd.to_datetime(row[headers["date"]]).isoformat(),
-                                payee=row[headers["payee"]],
-                                description=", ".join(
-                                    [
-                                        row[header]
-                                        for header in headers["description"]
-                                        if row[header] and not pd.isna(row[header])
-                                    ]
-                                )
-                                if headers["description"]
-                                else "",
-                                debit=0.0
-                                if pd.isna(row[headers["debit"]])
-                                else row[headers["debit"]],
-                                credit=0.0
-                                if pd.isna(row[headers["credit"]])
-                                else row[headers["credit"]],
-                                account=account_selection,
-                                currency=self.expense_tracker.accounts[
-                                    account_selection
-                                ].currency,
+                    with self.defer_saves():
+                        try:
+                            csv_file.seek(0)
+                            # The pyarrow engine (installed with Streamlit) parses
+                            # in parallel. It names columns differently (e.g. for
+                            # duplicate headers): keep the names chosen above.
+                            df = pd.read_csv(
+                                csv_file,
+                                engine="pyarrow",
+                                header=None,
+                                skiprows=1,
+                                names=columns,
+                            )
+                            new_transactions = self._transactions_from_csv(
+                                df, headers, account_selection, date_format or None
+                            )
+                            # Rules are only applied to the transactions they match
+                            # when edited, so new transactions are categorized now.
+                            for transaction in new_transactions:
+                                transaction.categorize(self.expense_tracker.rules)
+                            num_duplicates = self.expense_tracker.accounts[
+                                account_selection
+                            ].add_transactions(
+                                new_transactions, overwrite_if_exists=overwrite
+                            )
+                            st.toast(
+                                f"Added {len(new_transactions)} transactions, "
+                                f"found {num_duplicates} duplicates "
+                                f"({'overwritten' if overwrite else 'skipped'}).",
+                                icon="✅",
+                            )
+                            # Re-importing a file only finds duplicates: if they were
+                            # skipped, nothing changed, and the cached data stays valid.
+                            if overwrite or num_duplicates < len(new_transactions):
+                                self.save_and_reload(("accounts", "transactions"))
+                        except Exception as e:
+                            self.discard_unsaved_changes()
+                            st.error(
+                                f"Error reading CSV file: {e}.\nDetailed error:\n{traceback.format_exc()}"
                             )
-                            for _, row in df.iterrows()
-                        ]
-                        num_duplicates = self.expense_tracker.accounts[
-                            account_selection
-                        ].add_transactions(
-                            new_transactions, overwrite_if_exists=overwrite
-                        )
-                        with st.spinner(
-                            f"Adding {len(new_transactions)} transactions, found {num_duplicates} duplicates."
-                            f"{' Overwriting...' if overwrite else ' Skipping duplicates...'}"
-                        ):
-                            # TODO: This is horrendous, find a better way to display the message :')
-                            # The problem with toast is that I can't access the variables in the callback
-                            time.sleep(2.5)
-                        self.save_and_reload()
-                    except Exception as e:
-                        st.error(
-                            f"Error reading CSV file: {e}.\nDetailed error:\n{traceback.format_exc()}"
-                        )
 
         with st.expander("Delete transactions"):
             self.display_delete_transactions()
@@ -512,6 +814,7 @@ class ExpenseTrackerApp:
         else:
             self.display_transactions()
 
+    @fragment
     def display_rules_tab(self):
         st.header("🧮 Rules")
 
@@ -521,38 +824,13 @@ class ExpenseTrackerApp:
             # Assert there is only one condition. TODO: Remove this when multiple conditions are supported.
             assert all(len(rule.conditions) == 1 for rule in self.expense_tracker.rules)
 
-            # Add rules to DF but decompose condition (there is only 1 in each list)
-            df = pd.DataFrame(
-                [
-                    {
-                        "field": rule.conditions[0].field,
-                        "relation": rule.conditions[0].relation,
-                        "values": rule.conditions[0].values,
-                        "action": rule.action,
-                        "category": rule.category,
-                    }
-                    for rule in self.expense_tracker.rules
-                ]
-            )
-
-            st.dataframe(
-                df,
-                hide_index=True,
-                column_config={
-                    "field": st.column_config.SelectboxColumn(
-                        label="Field", options=Transaction.data_model().keys()
-                    ),
-                    "relation": st.column_config.SelectboxColumn(
-                        label="Relation", options=list(RuleRelation)
-                    ),
-                    "values": st.column_config.ListColumn(label="Values"),
-                    "action": st.column_config.SelectboxColumn(
-                        label="Action", options=list(RuleAction)
-                    ),
-                    "category": st.column_config.TextColumn(label="Category"),
-                    "operator": None,  # hide operator since it's not functional yet. TODO
-                },
-            )
+            rules = self.expense_tracker.rules
+            # A static table of preformatted strings is much cheaper to render
+            # than a DataFrame, and good enough for the usual handful of rules.
+            if len(rules) < RULES_TABLE_MAX_ROWS:
+                st.table(_load_rules_table_rows(self.data_version, rules))
+            else:
+                self.display_rules_dataframe()
 
         with st.expander("Add/Edit rule"):
             self.display_add_or_edit_rule()
@@ -578,12 +856,19 @@ class ExpenseTrackerApp:
         if not self.expense_tracker.accounts:
             st.write("No accounts yet...")
             return
+        balances = _load_account_balances(self.data_version, self.expense_tracker)
         st.dataframe(
-            [account.as_dict() for account in self.expense_tracker.accounts.values()],
+            pd.DataFrame.from_records(
+                (
+                    (name, account.currency, account.starting_balance, balances[name])
+                    for name, account in self.expense_tracker.accounts.items()
+                ),
+                columns=["name", "currency", "starting_balance", "balance"],
+            ),
             column_config={
                 "name": st.column_config.TextColumn(label="Account name"),
                 "currency": st.column_config.SelectboxColumn(
-                    label="Currency", options=list(Currency)
+                    label="Currency", options=_CURRENCIES
                 ),
                 "balance": st.column_config.NumberColumn(label="Balance"),
                 "starting_balance": None,  # hide starting balance
@@ -630,20 +915,45 @@ class ExpenseTrackerApp:
                 try:
                     self.expense_tracker.add_account(account)
                     st.success(f"Account {account.name} created.")
-                    self.save_and_reload()
+                    self.save_and_reload(("accounts",))
                 except ValueError as e:
                     st.error(f"Error adding account: {e}")
                     return
 
-    def save(self):
-        """Saves ExpenseTracker to session state. Doesn't reload."""
-        self.logger.info("Saving ExpenseTrackerApp...")
-        self.save_expense_tracker_to_session_state()
+    def save(self, keys: tuple[str, ...] = DICT_KEYS):
+        """Saves ExpenseTracker to session state. Doesn't reload.
+
+        Only the given keys (see `ExpenseTracker.as_dict`) are saved: pass the ones
+        that changed. Inside a `defer_saves` block, the save is postponed until
+        the block exits."""
+        if self._saves_deferred:
+            self._unsaved_keys.update(keys)
+            return
+        self.logger.info("Saving ExpenseTrackerApp (%s)...", ", ".join(keys))
+        self.save_expense_tracker_to_session_state(keys)
 
-    def save_and_reload(self):
-        """Saves ExpenseTracker to session state, and reloads the page."""
-        self.save()
-        st.experimental_rerun()
+    @contextlib.contextmanager
+    def defer_saves(self):
+        """Suppresses saves within the block, and saves once on exit if needed.
+
+        Use around bulk mutations, so the whole ExpenseTracker is serialized
+        once instead of once per mutation."""
+        self._saves_deferred = True
+        self._unsaved_keys = set()
+        try:
+            yield
+        finally:
+            self._saves_deferred = False
+            if self._unsaved_keys:
+                self.save(tuple(key for key in DICT_KEYS if key in self._unsaved_keys))
+
+    def save_and_reload(self, keys: tuple[str, ...] = DICT_KEYS):
+        """Saves ExpenseTracker to session state, and reloads the page.
+
+        The whole app is rerun, not only the current tab's fragment:
+        data changes must also show in the other tabs (e.g. balances)."""
+        self.save(keys)
+        rerun()
 
     def display_delete_account(self):
         """Displays a form to delete an account from ExpenseTracker."""
@@ -659,19 +969,30 @@ class ExpenseTrackerApp:
             ):
                 del self.expense_tracker.accounts[account_to_delete]
                 st.success(f"Account {account_to_delete} deleted.")
-                self.save_and_reload()
+                self.save_and_reload(("accounts", "transactions"))
 
     def display_transactions(self) -> None:
-        transactions = sorted(
-            [
-                transaction.as_dict()
-                for transaction in self.expense_tracker.transactions
-            ],
-            key=lambda t: t["date"],
-            reverse=True,  # Most recent transaction first
-        )
+        """Displays all transactions, most recent first, one page at a time.
+
+        Only the current page is sent to the browser."""
+        # A columnar DataFrame is passed as is, unlike a list of dictionaries.
+        df = _load_transactions_table(self.data_version, self.expense_tracker)
+        if len(df) > TRANSACTIONS_TABLE_PAGE_SIZE:
+            num_transactions = len(df)
+            page = st.number_input(
+                "Page",
+                min_value=1,
+                max_value=-(-num_transactions // TRANSACTIONS_TABLE_PAGE_SIZE),
+                value=1,
+                step=1,
+            )
+            start = (page - 1) * TRANSACTIONS_TABLE_PAGE_SIZE
+            df = df.iloc[start : start + TRANSACTIONS_TABLE_PAGE_SIZE]
+            st.caption(
+                f"Transactions {start + 1} to {start + len(df)} of {num_transactions}"
+            )
         st.dataframe(
-            transactions,
+            df,
             hide_index=True,
             column_config={
                 "date": st.column_config.DateColumn(
@@ -700,19 +1021,61 @@ class ExpenseTrackerApp:
                     label="Category",
                 ),
             },
-            column_order=[
-                "date",
-                "account",
-                "payee",
-                "description",
-                "debit",
-                "credit",
-                "currency",
-                "category",
-            ],  # Hide transaction_id, transfer_to, transfer_from
             use_container_width=True,
         )
 
+    def _transactions_from_csv(
+        self,
+        df: pd.DataFrame,
+        headers: dict,
+        account_name: str,
+        date_format: str | None = None,
+    ) -> list[Transaction]:
+        """Returns the transactions in a CSV DataFrame, for the given account.
+
+        `headers` maps each transaction field to its column(s) in the DataFrame.
+        Columns are converted as a whole, instead of row by row.
+        Dates are parsed with `date_format` if given, which is the fastest."""
+        if date_format:
+            dates = pd.to_datetime(df[headers["date"]], format=date_format)
+        else:
+            # Infer the date format from the first date, so that the rest
+            # of the column is parsed with it instead of date by date.
+            dates = pd.to_datetime(df[headers["date"]], infer_datetime_format=True)
+        dates = dates.dt.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+        if headers["description"]:
+            descriptions = [
+                ", ".join(value for value in values if value and not pd.isna(value))
+                for values in df[list(headers["description"])].itertuples(
+                    index=False, name=None
+                )
+            ]
+        else:
+            descriptions = [""] * len(df)
+        debits = _amounts_from_csv(df[headers["debit"]])
+        credits = _amounts_from_csv(df[headers["credit"]])
+        currency = self.expense_tracker.accounts[account_name].currency
+        return [
+            Transaction(
+                transaction_id=transaction_id,
+                date=date,
+                payee=payee,
+                description=description,
+                debit=debit,
+                credit=credit,
+                account=account_name,
+                currency=currency,
+            )
+            for transaction_id, date, payee, description, debit, credit in zip(
+                df[headers["transaction_id"]].tolist(),
+                dates,
+                df[headers["payee"]].tolist(),
+                descriptions,
+                debits.tolist(),
+                credits.tolist(),
+            )
+        ]
+
     def display_delete_transactions(self) -> None:
         """Displays a form to delete transactions from ExpenseTracker.
 
@@ -732,11 +1095,37 @@ class ExpenseTrackerApp:
             for account in accounts_to_delete:
                 self.expense_tracker.accounts[account].transactions = {}
             st.success(f"Transactions deleted for {accounts_to_delete}.")
-            self.save_and_reload()
+            self.save_and_reload(("accounts", "transactions"))
+
+    def display_rules_dataframe(self) -> None:
+        """Displays all rules in ExpenseTracker as an interactive DataFrame."""
+        df = _load_rules_dataframe(self.data_version, self.expense_tracker.rules)
+
+        st.dataframe(
+            df,
+            hide_index=True,
+            column_config={
+                "field": st.column_config.SelectboxColumn(
+                    label="Field", options=_TRANSACTION_FIELDS
+                ),
+                "relation": st.column_config.SelectboxColumn(
+                    label="Relation", options=_RULE_RELATIONS
+                ),
+                "values": st.column_config.ListColumn(label="Values"),
+                "action": st.column_config.SelectboxColumn(
+                    label="Action", options=_RULE_ACTIONS
+                ),
+                "category": st.column_config.TextColumn(label="Category"),
+                "operator": None,  # hide operator since it's not functional yet. TODO
+            },
+        )
 
     def display_add_or_edit_rule(self):
         def get_index(l: list, item: object) -> int:
-            """Returns index of item in list, or 0 if not found."""
+            """Returns index of item in list, or 0 if not found.
+
+            Only for options that change with the data: the fixed options
+            have module-level index dictionaries."""
             try:
                 return l.index(item)
             except ValueError:
@@ -760,25 +1149,21 @@ class ExpenseTrackerApp:
         # TODO: I need to find a way to add support for RuleOperator (AND, OR, NOT)
 
         left, middle, right = st.columns([1, 1, 2])
-        transaction_headers = list(Transaction.data_model().keys())
         target = left.selectbox(
             "Target",
-            transaction_headers,
+            _TRANSACTION_FIELDS,
             key="rule_target_selectbox",
-            index=get_index(
-                transaction_headers,
-                rule_to_edit.conditions[0].field if edit_rule else None,
+            index=_TRANSACTION_FIELD_INDEX.get(
+                rule_to_edit.conditions[0].field if edit_rule else None, 0
             ),
             help="The transaction field to match against. `payee` or `description` are the most common to use here.",
         )
-        rule_relations = list(RuleRelation)
         relation = middle.selectbox(
             "Relation",
-            rule_relations,
+            _RULE_RELATIONS,
             key="rule_relation_selectbox",
-            index=get_index(
-                rule_relations,
-                rule_to_edit.conditions[0].relation if edit_rule else None,
+            index=_RULE_RELATION_INDEX.get(
+                rule_to_edit.conditions[0].relation if edit_rule else None, 0
             ),
             help="""
             `contains` will match if the target contains any of the specified values.
@@ -790,8 +1175,8 @@ class ExpenseTrackerApp:
             `one of` will match if the target is equal to any of the specified values.""",
         )
         if relation == RuleRelation.EQUALS:
-            entries_for_target = self.expense_tracker.get_entries_for_transaction_field(
-                target
+            entries_for_target = _load_entries_for_transaction_field(
+                self.data_version, target, self.expense_tracker
             )
             rule_value = right.selectbox(
                 "Value",
@@ -814,12 +1199,14 @@ class ExpenseTrackerApp:
                     Separate values with a comma.
 
                     The values are case-insensitive ('foo', 'Foo', and 'FOO' are all the same).""",
-                value=", ".join(rule_to_edit.conditions[0].values) if edit_rule else "",
+                value=", ".join(map(str, rule_to_edit.conditions[0].values))
+                if edit_rule
+                else "",
             )
             rule_value = [value.strip().lower() for value in rule_value.split(",")]
         elif relation == RuleRelation.ONE_OF:
-            entries_for_target = self.expense_tracker.get_entries_for_transaction_field(
-                target
+            entries_for_target = _load_entries_for_transaction_field(
+                self.data_version, target, self.expense_tracker
             )
             rule_value = right.multiselect(
                 "Values",
@@ -832,12 +1219,11 @@ class ExpenseTrackerApp:
             st.write("RuleRelation not implemented.")
 
         left, right = st.columns([1, 1])
-        rule_actions = list(RuleAction)
         action = left.selectbox(
             "Action",
-            rule_actions,
+            _RULE_ACTIONS,
             help="What to do with the transaction if the rule matches.",
-            index=get_index(rule_actions, rule_to_edit.action if edit_rule else None),
+            index=_RULE_ACTION_INDEX.get(rule_to_edit.action if edit_rule else None, 0),
         )
         if action == RuleAction.CATEGORIZE:
             category = right.text_input(
@@ -865,47 +1251,49 @@ class ExpenseTrackerApp:
         if st.button(button_label, type="primary"):
             conditions = [RuleCondition(target, relation, rule_value)]
             rule = Rule(conditions, action, category)
-            try:
+            with self.defer_saves():
+                try:
+                    if edit_rule:
+                        self.expense_tracker.delete_rule(rule_to_edit)
+                    self.expense_tracker.add_rule(rule)
+                except ValueError as e:
+                    # Editing deletes the old rule first: put it back.
+                    self.discard_unsaved_changes()
+                    st.error(f"Error adding rule: {e}")
+                    return
                 if edit_rule:
-                    self.expense_tracker.delete_rule(rule_to_edit)
-                self.expense_tracker.add_rule(rule)
-            except ValueError as e:
-                st.error(f"Error adding rule: {e}")
-                return
-            self.expense_tracker.categorize_transactions()
-            self.save_and_reload()
+                    self.expense_tracker.unapply_rule(rule_to_edit)
+                self.expense_tracker.apply_rule(rule)
+                self.save_and_reload(("rules", "transactions"))
 
     def display_delete_rule(self):
-        for rule in self.expense_tracker.rules:
-            conditions_pretty = f", {rule.operator} ".join(
-                [
-                    f"*{condition.field}* `{condition.relation}` *{condition.values}*"
-                    for condition in rule.conditions
-                ]
-            )
-            col1, col2 = st.columns([3, 1])
-            rule_pretty = f"**Rule:** `IF` {conditions_pretty} `THEN` *{rule.action}* `=` *{rule.category}*."
-            col1.markdown(rule_pretty)
-            if col2.button(
-                "❌",
-                key=str(uuid.uuid4()),
-                use_container_width=True,
-                on_click=delete_rule_callback,
-                args=(
-                    self,
-                    rule,
-                ),
-            ):
-                pass
-
-
-# I have no idea why, but having this code as a callback works.
-# The same code in the display_delete_rule function, it won't work.
-def delete_rule_callback(app: ExpenseTrackerApp, rule: Rule):
-    app.expense_tracker.delete_rule(rule)
-    app.expense_tracker.categorize_transactions()
-    app.save()
-    st.toast("Rule deleted.")
+        """Displays the rules with a checkbox each, and a button to delete
+        the checked ones."""
+        rules = self.expense_tracker.rules
+        if not rules:
+            return
+        df = pd.DataFrame(_load_rules_table_rows(self.data_version, rules))
+        df["Delete"] = False
+        edited_df = st.data_editor(
+            df,
+            # Edits are stored per row position: start over when the rules change.
+            key=f"delete_rules_editor_{self.data_version}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=["Conditions", "Action", "Category"],
+            column_config={"Delete": st.column_config.CheckboxColumn(label="Delete")},
+        )
+        rules_to_delete = [
+            rule for rule, delete in zip(rules, edited_df["Delete"]) if delete
+        ]
+        if st.button(
+            "Delete selected rules", disabled=not rules_to_delete, type="primary"
+        ):
+            for rule in rules_to_delete:
+                self.expense_tracker.delete_rule(rule)
+                self.expense_tracker.unapply_rule(rule)
+            st.toast(f"Deleted {len(rules_to_delete)} rule(s).")
+            self.save_and_reload(("rules", "transactions"))
 
 
 def main():
@@ -1,6 +1,14 @@
-"""Contains functions for creating charts/plots."""
+"""Contains functions for creating charts/plots.
 
-import altair as alt
+Charts are written directly as Vega-Lite specifications (plain dictionaries),
+instead of being built through Altair, whose schema validation dominates
+the cost of building a chart.
+
+Data is aggregated per time unit (and summed cumulatively) with pandas before
+being plotted, so only the aggregated rows are sent to the browser, and the
+specifications need no transforms."""
+
+import numpy as np
 import pandas as pd
 
 
@@ -18,97 +26,139 @@ ALTAIR_TIMEUNIT_TO_PRETTY = {
     "year": "Year",
 }
 
+ALTAIR_TIMEUNIT_TO_PANDAS_PERIOD = {
+    "yearmonthdate": "D",
+    "yearweek": "W-SAT",  # Vega-Lite weeks start on Sunday.
+    "yearmonth": "M",
+    "year": "Y",
+}
 
-def get_chart_data(
+CHART_TYPE_TO_MARK = {
+    "line": {"type": "line", "interpolate": "monotone", "strokeWidth": 2.5},
+    "bar": {"type": "bar"},
+}
+
+
+def aggregate_chart_data(
     df: pd.DataFrame,
     transaction_field: str,
     group_by: str,
     timeunit: str,
-    cumulative: bool,
-    chart_type: str,
-) -> alt.Chart:
-    """Returns a chart object with the data transformed and ready to be plotted."""
+    cumulative: bool = False,
+) -> pd.DataFrame:
+    """Returns the sum of `transaction_field` per time unit (and per `group_by`),
+    or its running total if `cumulative`. Each group has a row for every
+    time unit in the data (0 if it has no transactions).
+
+    The start of each time unit is in column `ym`, as expected by `get_chart_data`."""
+    group_cols = ["ym"] if group_by == "none" else ["ym", group_by]
+    period = ALTAIR_TIMEUNIT_TO_PANDAS_PERIOD[timeunit]
+    totals = (
+        df.assign(ym=df["date"].dt.to_period(period).dt.start_time)
+        # Only keep the groups that appear in the data, for categorical columns.
+        .groupby(group_cols, observed=True)[transaction_field].sum()
+    )
+    if group_by != "none":
+        # One column per group, with the missing time units filled with 0.
+        totals = totals.unstack(fill_value=0)
     if cumulative:
-        chart = (
-            alt.Chart(df)
-            .transform_impute(
-                impute=f"cumulative_{transaction_field}",
-                groupby=[group_by],
-                key="date",
-                value=0,
-                method="value",
-            )
-            .transform_timeunit(
-                ym=f"{timeunit}(date)",
-            )
-            .transform_aggregate(
-                total_field=f"sum({transaction_field})",
-                groupby=[
-                    "ym",
-                    group_by,
-                ],
-            )
-            .transform_window(
-                sort=[{"field": "ym", "order": "ascending"}],
-                cumulative_total_field="sum(total_field)",
-                frame=[None, 0],
-                groupby=[group_by],
-            )
-        )
-    else:
-        chart = (
-            alt.Chart(df)
-            .transform_impute(
-                impute=f"{transaction_field}",
-                groupby=["date"],
-                key="transaction_id",
-                value=0,
-                method="value",
-            )
-            .transform_timeunit(
-                ym=f"{timeunit}(date)",
-            )
-        )
+        totals = totals.cumsum()
+    if group_by != "none":
+        totals = totals.stack()
+    return totals.reset_index(name=transaction_field)
 
-    if chart_type == "line":
-        chart = chart.mark_line(interpolate="monotone", strokeWidth=2.5)
-    elif chart_type == "bar":
-        chart = chart.mark_bar()
 
+def downsample_m4(
+    df: pd.DataFrame, transaction_field: str, group_by: str, width: int = 1000
+) -> pd.DataFrame:
+    """Returns the aggregated rows needed to draw lines `width` pixels wide.
+
+    M4 downsampling: the time axis is split into `width` buckets, and only the
+    first, last, smallest and largest rows of each bucket (per group) are kept,
+    which draws the same lines. Data with fewer than 4 rows per pixel is returned as is.
+    """
+    start, end = df["ym"].min(), df["ym"].max()
+    if len(df) < 4 * width or start == end:
+        return df
+    buckets = (
+        ((df["ym"] - start) / ((end - start) / width))
+        .astype(int)
+        .clip(upper=width - 1)
+        .rename("bucket")
+    )
+    keys = (
+        buckets.to_frame()
+        if group_by == "none"
+        else df[[group_by]].assign(bucket=buckets)
+    )
+    # Rows sorted by bucket (and group), then by value: the first and last rows
+    # of each bucket are its smallest and largest values, one row each.
+    bucket_ids = keys.groupby(list(keys), observed=True, sort=False).ngroup().to_numpy()
+    order = np.lexsort((df[transaction_field].to_numpy(), bucket_ids))
+    sorted_ids = bucket_ids[order]
+    bucket_starts = np.flatnonzero(np.diff(sorted_ids)) + 1
+    keep = np.zeros(len(df), dtype=bool)
+    keep[order[np.r_[0, bucket_starts]]] = True  # Smallest values
+    keep[order[np.r_[bucket_starts - 1, len(df) - 1]]] = True  # Largest values
+    # Aggregated data is sorted by time unit, so the first and last rows
+    # of each bucket are also its first and last time units.
+    keep |= ~keys.duplicated().to_numpy() | ~keys.duplicated(keep="last").to_numpy()
+    return df[keep]
+
+
+def get_chart_data(
+    transaction_field: str,
+    group_by: str,
+    timeunit: str,
+    cumulative: bool,
+    chart_type: str,
+) -> dict:
+    """Returns a Vega-Lite specification that plots the data.
+
+    The data is expected to be aggregated by `aggregate_chart_data`,
+    with the same `cumulative`. It isn't part of the specification,
+    and is passed alongside it (e.g. `st.vega_lite_chart(df, spec)`)."""
     tooltip = [
-        alt.Tooltip(
-            "ym:T",
-            title="Date",
-            format=ALTAIR_TIMEUNIT_TO_TIME_FORMAT[timeunit],
-        ),
-        alt.Tooltip(
-            "cumulative_total_field:Q" if cumulative else f"{transaction_field}:Q",
-            title="Amount",
-            format=",.1f",
-        ),
+        {
+            "field": "ym",
+            "type": "temporal",
+            "title": "Date",
+            "format": ALTAIR_TIMEUNIT_TO_TIME_FORMAT[timeunit],
+        },
+        {
+            "field": transaction_field,
+            "type": "quantitative",
+            "title": "Amount",
+            "format": ",.1f",
+        },
     ]
     if group_by != "none":
-        tooltip.append(alt.Tooltip(f"{group_by}:N", title=group_by.capitalize()))
-
-    chart = chart.encode(
-        x=alt.X("ym:T", title="Date"),
-        y=alt.Y(
-            "cumulative_total_field:Q" if cumulative else f"{transaction_field}:Q",
-            title=f"Cumulative {transaction_field.capitalize()}"
-            if cumulative
-            else f"{transaction_field.capitalize()}",
-        ),
-        tooltip=tooltip,
-        color=(
-            alt.Color(
-                f"{group_by}:N",
-                title=f"{group_by.capitalize()}",
-                legend=alt.Legend(direction="horizontal", orient="bottom"),
-            )
-            if group_by != "none"
-            else alt.value("steelblue")
-        ),
-    ).properties(
-        title=f"{'Cumulative ' if cumulative else ''}{transaction_field.capitalize()} {chart_type} chart grouped by {ALTAIR_TIMEUNIT_TO_PRETTY[timeunit]} {f', grouped by {group_by.capitalize()}' if group_by != 'none' else ''}"
-    )
-    return chart
+        tooltip.append(
+            {"field": group_by, "type": "nominal", "title": group_by.capitalize()}
+        )
+
+    return {
+        "mark": CHART_TYPE_TO_MARK[chart_type],
+        "encoding": {
+            "x": {"field": "ym", "type": "temporal", "title": "Date"},
+            "y": {
+                "field": transaction_field,
+                "type": "quantitative",
+                "title": f"Cumulative {transaction_field.capitalize()}"
+                if cumulative
+                else f"{transaction_field.capitalize()}",
+            },
+            "tooltip": tooltip,
+            "color": (
+                {
+                    "field": group_by,
+                    "type": "nominal",
+                    "title": f"{group_by.capitalize()}",
+                    "legend": {"direction": "horizontal", "orient": "bottom"},
+                }
+                if group_by != "none"
+                else {"value": "steelblue"}
+            ),
+        },
+        "title": f"{'Cumulative ' if cumulative else ''}{transaction_field.capitalize()} {chart_type} chart grouped by {ALTAIR_TIMEUNIT_TO_PRETTY[timeunit]} {f', grouped by {group_by.capitalize()}' if group_by != 'none' else ''}",
+    }
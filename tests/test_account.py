@@ -0,0 +1,41 @@
+import pytest
+
+from Account import Account
+from Currency import Currency
+from Transaction import Transaction
+
+
+def _transaction(transaction_id: str, payee: str) -> Transaction:
+    return Transaction(
+        transaction_id, "2023-01-01", payee, "", 10.0, 0.0, "a", Currency.CHF
+    )
+
+
+@pytest.mark.parametrize(
+    "overwrite_if_exists, expected_payee", [(False, "first"), (True, "second")]
+)
+def test_add_transactions_with_duplicate_ids_in_batch(
+    overwrite_if_exists, expected_payee
+):
+    account = Account("a", Currency.CHF)
+
+    num_duplicates = account.add_transactions(
+        [_transaction("1", "first"), _transaction("1", "second")],
+        overwrite_if_exists=overwrite_if_exists,
+    )
+
+    assert num_duplicates == 1
+    assert account.transactions["1"].payee == expected_payee
+
+
+def test_add_transactions_skips_existing_ids():
+    account = Account("a", Currency.CHF)
+    account.add_transaction(_transaction("1", "existing"))
+
+    num_duplicates = account.add_transactions(
+        [_transaction("1", "new"), _transaction("2", "new")]
+    )
+
+    assert num_duplicates == 1
+    assert account.transactions["1"].payee == "existing"
+    assert account.transactions["2"].payee == "new"
@@ -0,0 +1,58 @@
+import math
+
+import pytest
+
+import ExpenseTracker
+from Account import Account
+from Currency import Currency
+from Rule import Rule, RuleAction, RuleCondition, RuleRelation
+from Transaction import Transaction
+
+
+def _tracker() -> ExpenseTracker.ExpenseTracker:
+    payees = ["Coop Basel", "MIGROS", math.nan, "Rent", "SBB CFF"]
+    transactions = {
+        str(i): Transaction(
+            str(i), "2023-01-01", payee, "", 10.0, 0.0, "a", Currency.CHF
+        )
+        for i, payee in enumerate(payees)
+    }
+    rules = [
+        Rule(
+            [RuleCondition("payee", RuleRelation.CONTAINS, ["coop", "migros"])],
+            RuleAction.CATEGORIZE,
+            "Groceries",
+        ),
+        Rule(
+            [RuleCondition("payee", RuleRelation.EQUALS, ["Rent"])],
+            RuleAction.CATEGORIZE,
+            "Housing",
+        ),
+        Rule(
+            [RuleCondition("debit", RuleRelation.ONE_OF, [10.0])],
+            RuleAction.CATEGORIZE,
+            "Fallback",
+        ),
+    ]
+    return ExpenseTracker.ExpenseTracker(
+        accounts={"a": Account("a", Currency.CHF, transactions=transactions)},
+        rules=rules,
+    )
+
+
+@pytest.mark.parametrize("min_rules_to_index", [0, math.inf])
+def test_categorize_transactions_with_and_without_index(
+    monkeypatch, min_rules_to_index
+):
+    monkeypatch.setattr(ExpenseTracker, "MIN_RULES_TO_INDEX", min_rules_to_index)
+    tracker = _tracker()
+
+    tracker.categorize_transactions()
+
+    assert [t.category for t in tracker.transactions] == [
+        "Groceries",
+        "Groceries",
+        "Fallback",
+        "Housing",
+        "Fallback",
+    ]
@@ -0,0 +1,23 @@
+import io
+
+import pandas as pd
+import pytest
+
+from app import _amounts_from_csv
+
+
+def _read_csv(data: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(data), engine="pyarrow")
+
+
+def test_empty_amounts_are_zero():
+    df = _read_csv(b"amount,payee\n1.5,a\n,b\n  ,c\n")
+
+    assert _amounts_from_csv(df["amount"]).tolist() == [1.5, 0.0, 0.0]
+
+
+def test_unreadable_amounts_raise_with_their_lines():
+    df = _read_csv(b"amount\n1'234.50\n2\n\"1.234,50\"\n")
+
+    with pytest.raises(ValueError, match="lines 2, 4"):
+        _amounts_from_csv(df["amount"])
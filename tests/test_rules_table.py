@@ -0,0 +1,26 @@
+import math
+
+from app import _load_rules_table_rows
+from Rule import Rule, RuleAction, RuleCondition, RuleRelation
+
+
+def test_rules_table_renders_non_text_values():
+    rules = [
+        Rule(
+            [RuleCondition("debit", RuleRelation.EQUALS, [12.5])],
+            RuleAction.CATEGORIZE,
+            "A",
+        ),
+        Rule(
+            [RuleCondition("payee", RuleRelation.ONE_OF, ["Coop", math.nan])],
+            RuleAction.CATEGORIZE,
+            "B",
+        ),
+    ]
+
+    rows = _load_rules_table_rows("test", rules)
+
+    assert [row["Conditions"] for row in rows] == [
+        "debit is [12.5]",
+        "payee one of [Coop, nan]",
+    ]